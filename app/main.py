@@ -3,37 +3,86 @@ from __future__ import annotations
 import asyncio
 import os
 import time
-from collections import defaultdict, deque
+from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, HTTPException, Request
-from fastapi.middleware.cors import CORSMiddleware
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
 
 from app.routers.qr import router as qr_router
 
 load_dotenv()
 
-app = FastAPI(title="QR Creator", version="0.1.0", docs_url="/swagger", redoc_url="/docs")
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=[
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    sweeper = asyncio.create_task(_sweep_buckets())
+    try:
+        yield
+    finally:
+        sweeper.cancel()
+
+
+app = FastAPI(title="QR Creator", version="0.1.0", docs_url="/swagger", redoc_url="/docs", lifespan=lifespan)
+
+# CORS: la lista de orígenes es fija, así que basta una comprobación de
+# pertenencia en un frozenset en vez de la capa completa de CORSMiddleware.
+_ALLOWED_ORIGINS = frozenset(
+    {
         "http://localhost:3000",
         "http://127.0.0.1:3000",
         "http://10.20.10.10:3200",
         "http://10.20.10.10:3210",
         "https://qr.joboufra.es",
-    ],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    }
 )
 
-# Rate limiting (in-memory, por proceso)
+
+@app.middleware("http")
+async def cors(request: Request, call_next):
+    origin = request.headers.get("origin")
+    if origin is None:
+        return await call_next(request)
+
+    allowed = origin in _ALLOWED_ORIGINS
+    if request.method == "OPTIONS" and "access-control-request-method" in request.headers:
+        if not allowed:
+            return JSONResponse(status_code=400, content={"detail": "Origen no permitido"})
+        headers = {
+            "Access-Control-Allow-Origin": origin,
+            "Access-Control-Allow-Credentials": "true",
+            "Access-Control-Allow-Methods": request.headers["access-control-request-method"],
+            "Access-Control-Max-Age": "600",
+            "Vary": "Origin",
+        }
+        requested_headers = request.headers.get("access-control-request-headers")
+        if requested_headers:
+            headers["Access-Control-Allow-Headers"] = requested_headers
+        return Response(status_code=200, headers=headers)
+
+    response = await call_next(request)
+    if allowed:
+        response.headers["Access-Control-Allow-Origin"] = origin
+        response.headers["Access-Control-Allow-Credentials"] = "true"
+        response.headers.add_vary_header("Origin")
+    return response
+
+# Rate limiting (in-memory, por proceso): token bucket por IP.
+# Cada entrada guarda (tokens disponibles, último refill). La lectura y la
+# escritura del dict son operaciones atómicas bajo el GIL y no hay await entre
+# ambas, así que no hace falta ningún lock que serialice todas las peticiones.
 RATE_LIMIT = int(os.getenv("QR_RATE_LIMIT", "60"))  # peticiones
 RATE_WINDOW = int(os.getenv("QR_RATE_WINDOW", "60"))  # segundos
-_buckets: dict[str, deque[float]] = defaultdict(deque)
-_bucket_lock = asyncio.Lock()
+_buckets: dict[str, tuple[float, float]] = {}
+
+
+async def _sweep_buckets() -> None:
+    """Purga periódicamente buckets de IPs inactivas para acotar memoria."""
+    while True:
+        await asyncio.sleep(60)
+        cutoff = time.monotonic() - RATE_WINDOW * 10
+        for ip in [ip for ip, (_, ts) in _buckets.items() if ts < cutoff]:
+            _buckets.pop(ip, None)
 
 
 @app.middleware("http")
@@ -45,18 +94,17 @@ async def rate_limit(request: Request, call_next):
     now = time.monotonic()
     client_ip = request.client.host if request.client else "anonymous"
 
-    async with _bucket_lock:
-        bucket = _buckets[client_ip]
-        # Limpia timestamps fuera de ventana
-        cutoff = now - RATE_WINDOW
-        while bucket and bucket[0] < cutoff:
-            bucket.popleft()
-        if len(bucket) >= RATE_LIMIT:
-            raise HTTPException(
-                status_code=429,
-                detail=f"Demasiadas peticiones: límite {RATE_LIMIT} cada {RATE_WINDOW}s",
-            )
-        bucket.append(now)
+    tokens, last = _buckets.get(client_ip, (float(RATE_LIMIT), now))
+    tokens = min(float(RATE_LIMIT), tokens + (now - last) * RATE_LIMIT / RATE_WINDOW)
+    if tokens < 1.0:
+        _buckets[client_ip] = (tokens, now)
+        # Respuesta directa: las HTTPException lanzadas en middleware no pasan
+        # por los exception handlers de la app.
+        return JSONResponse(
+            status_code=429,
+            content={"detail": f"Demasiadas peticiones: límite {RATE_LIMIT} cada {RATE_WINDOW}s"},
+        )
+    _buckets[client_ip] = (tokens - 1.0, now)
 
     return await call_next(request)
 
@@ -66,3 +114,21 @@ app.include_router(qr_router, prefix="/api")
 @app.get("/healthz", include_in_schema=False)
 def healthz() -> dict[str, str]:
     return {"status": "ok"}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    # uvloop y httptools vienen con uvicorn[standard]; evitan el event loop y
+    # el parser HTTP puros de Python. WORKERS: ~1 por núcleo (el render es
+    # CPU-bound), teniendo en cuenta que cache y rate limit son por proceso.
+    uvicorn.run(
+        "app.main:app",
+        host="0.0.0.0",
+        port=int(os.getenv("PORT", "8000")),
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("WORKERS", "4")),
+        limit_concurrency=1000,
+        timeout_keep_alive=30,
+    )
@@ -1,22 +1,29 @@
 from __future__ import annotations
 
+import asyncio
+import functools
+import hashlib
 import io
 import os
 import re
+import struct
+import zlib
+from collections import OrderedDict
 from enum import Enum
 from typing import Tuple
 
+import numpy as np
 import qrcode
-from fastapi import APIRouter, Body, Depends, HTTPException, Query, Security, status
+import segno
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Security, status
+from fastapi.exceptions import RequestValidationError
 from fastapi.responses import Response
 from fastapi.security import APIKeyHeader
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field, ConfigDict, ValidationError, ValidationInfo, field_validator
 from qrcode.constants import ERROR_CORRECT_H, ERROR_CORRECT_L, ERROR_CORRECT_M, ERROR_CORRECT_Q
-from qrcode.image.pil import PilImage
 from qrcode.image.styledpil import StyledPilImage
 from qrcode.image.styles.colormasks import QRColorMask, SolidFillColorMask
 from qrcode.image.styles.moduledrawers import CircleModuleDrawer, SquareModuleDrawer
-from qrcode.image.svg import SvgImage
 
 # Drawers de módulos adicionales (qrcode>=7; si faltan, degradamos solo esos estilos).
 try:
@@ -38,7 +45,31 @@ except ImportError:
 
     AA_FACTOR = 4  # antialiasing
 
+    @functools.lru_cache(maxsize=64)
+    def _circle_eye_sprite(mode: str, box_size: int, back_color, paint_color):
+        """Sprite circular con antialiasing, cacheado por (modo, tamaño, colores)."""
+        big = box_size * AA_FACTOR
+        circle = Image.new(mode, (big, big), back_color)
+        ImageDraw.Draw(circle).ellipse((0, 0, big, big), fill=paint_color)
+        return circle.resize((box_size, box_size), Image.Resampling.LANCZOS)
+
+    @functools.lru_cache(maxsize=64)
+    def _rounded_eye_sprite(mode: str, box_size: int, back_color, paint_color, radius_ratio: float, padding_ratio: float):
+        """Sprite redondeado con antialiasing, cacheado por (modo, tamaño, colores, ratios)."""
+        big = box_size * AA_FACTOR
+        pad = int(big * padding_ratio)
+        radius = int(big * radius_ratio)
+        rounded = Image.new(mode, (big, big), back_color)
+        ImageDraw.Draw(rounded).rounded_rectangle(
+            (pad, pad, big - pad, big - pad),
+            radius=radius,
+            fill=paint_color,
+        )
+        return rounded.resize((box_size, box_size), Image.Resampling.LANCZOS)
+
     class SquareEyeDrawer(StyledPilQRModuleDrawer):  # type: ignore[misc]
+        __slots__ = ("_draw",)
+
         needs_neighbors = False
 
         def initialize(self, *args, **kwargs):
@@ -50,21 +81,26 @@ except ImportError:
                 self._draw.rectangle(box, fill=self.img.paint_color)
 
     class CircleEyeDrawer(StyledPilQRModuleDrawer):  # type: ignore[misc]
+        __slots__ = ("circle",)
+
         needs_neighbors = False
 
         def initialize(self, *args, **kwargs):
             super().initialize(*args, **kwargs)
-            size = self.img.box_size
-            big = size * AA_FACTOR
-            circle = Image.new(self.img.mode, (big, big), self.img.color_mask.back_color)
-            ImageDraw.Draw(circle).ellipse((0, 0, big, big), fill=self.img.paint_color)
-            self.circle = circle.resize((size, size), Image.Resampling.LANCZOS)
+            self.circle = _circle_eye_sprite(
+                self.img.mode,
+                self.img.box_size,
+                tuple(self.img.color_mask.back_color),
+                tuple(self.img.paint_color),
+            )
 
         def drawrect(self, box, is_active: bool):
             if is_active:
                 self.img._img.paste(self.circle, (box[0][0], box[0][1]))
 
     class RoundedEyeDrawer(StyledPilQRModuleDrawer):  # type: ignore[misc]
+        __slots__ = ("radius_ratio", "padding_ratio", "rounded")
+
         needs_neighbors = False
 
         def __init__(self, radius_ratio: float = 0.25, padding_ratio: float = 0.12):
@@ -73,17 +109,14 @@ except ImportError:
 
         def initialize(self, *args, **kwargs):
             super().initialize(*args, **kwargs)
-            size = self.img.box_size
-            big = size * AA_FACTOR
-            pad = int(big * self.padding_ratio)
-            radius = int(big * self.radius_ratio)
-            rounded = Image.new(self.img.mode, (big, big), self.img.color_mask.back_color)
-            ImageDraw.Draw(rounded).rounded_rectangle(
-                (pad, pad, big - pad, big - pad),
-                radius=radius,
-                fill=self.img.paint_color,
+            self.rounded = _rounded_eye_sprite(
+                self.img.mode,
+                self.img.box_size,
+                tuple(self.img.color_mask.back_color),
+                tuple(self.img.paint_color),
+                self.radius_ratio,
+                self.padding_ratio,
             )
-            self.rounded = rounded.resize((size, size), Image.Resampling.LANCZOS)
 
         def drawrect(self, box, is_active: bool):
             if is_active:
@@ -126,65 +159,21 @@ class FillMode(str, Enum):
     gradient = "gradient"
 
 
+_EC_MAP = {
+    ErrorCorrection.L: ERROR_CORRECT_L,
+    ErrorCorrection.M: ERROR_CORRECT_M,
+    ErrorCorrection.Q: ERROR_CORRECT_Q,
+    ErrorCorrection.H: ERROR_CORRECT_H,
+}
+
+
 api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False, description="Clave API si el backend la exige")
 
 
 class QRRequest(BaseModel):
-    model_config = ConfigDict(
-        populate_by_name=True,
-        json_schema_extra={
-            "examples": [
-                {
-                    "summary": "PNG solido",
-                    "value": {
-                        "data": "Hola mundo",
-                        "format": "png",
-                        "error_correction": "M",
-                        "box_size": 10,
-                        "border": 4,
-                        "fill_color": "#7c3aed",
-                        "back_color": "#0b0f1a",
-                        "style": "gapped",
-                        "eye_style": "square",
-                        "eye_color": "#38bdf8",
-                        "fill_mode": "solid",
-                    },
-                },
-                {
-                    "summary": "PNG degradado y ojos separados",
-                    "value": {
-                        "data": "https://ejemplo.com",
-                        "format": "png",
-                        "error_correction": "H",
-                        "box_size": 12,
-                        "border": 4,
-                        "fill_color": "#0ea5e9",
-                        "fill_color_to": "#7c3aed",
-                        "back_color": "#0f172a",
-                        "style": "bars-horizontal",
-                        "eye_style": "gapped",
-                        "eye_color": "#38bdf8",
-                        "fill_mode": "gradient",
-                    },
-                },
-                {
-                    "summary": "SVG simple",
-                    "value": {
-                        "data": "Texto en SVG",
-                        "format": "svg",
-                        "error_correction": "M",
-                        "box_size": 10,
-                        "border": 4,
-                        "fill_color": "#000000",
-                        "back_color": "#ffffff",
-                        "style": "square",
-                        "eye_style": "auto",
-                        "fill_mode": "solid"
-                    },
-                },
-            ]
-        },
-    )
+    # Los ejemplos viven solo en el openapi_extra de la ruta: duplicarlos en
+    # json_schema_extra engordaba el schema del modelo y su construcción.
+    model_config = ConfigDict(populate_by_name=True)
     data: str = Field(..., min_length=1, max_length=1024, description="Texto o URL a codificar")
     output_format: OutputFormat = Field(default=OutputFormat.png, alias="format")
     error_correction: ErrorCorrection = Field(default=ErrorCorrection.M)
@@ -197,6 +186,17 @@ class QRRequest(BaseModel):
     eye_color: str | None = Field(default="#38bdf8")
     eye_style: EyeStyle = Field(default=EyeStyle.square)
     style: Style = Field(default=Style.gapped)
+    # zlib nivel 1: codifica 2-3x más rápido que el 6 por defecto de PIL con
+    # un PNG algo mayor; sube el nivel si priorizas tamaño sobre latencia.
+    compress_level: int = Field(default=1, ge=0, le=9, description="Nivel zlib del PNG (0-9)")
+
+    @field_validator("fill_color", "back_color", "fill_color_to", "eye_color")
+    @classmethod
+    def _norm_color(cls, value: str | None, info: ValidationInfo) -> str | None:
+        # Normaliza a #rrggbb durante el parseo; el render recibe colores listos.
+        if value is None:
+            return value
+        return _validate_color(value, info.field_name)
 
 
 def require_api_key(x_api_key: str | None = Security(api_key_header)) -> str | None:
@@ -209,22 +209,29 @@ def require_api_key(x_api_key: str | None = Security(api_key_header)) -> str | N
 router = APIRouter(tags=["qr"], dependencies=[Depends(require_api_key)])
 
 
+_COLOR_RE = re.compile(r"#?(?P<hex>[0-9a-fA-F]{6}|[0-9a-fA-F]{3})")
+
+# Nombres que PIL acepta pero la validación hex no; se normalizan directamente.
+_NAMED_COLORS = {"black": "#000000", "white": "#ffffff"}
+
+
 def _validate_color(value: str, param_name: str) -> str:
-    match = re.fullmatch(r"#?(?P<hex>[0-9a-fA-F]{6}|[0-9a-fA-F]{3})", value)
+    named = _NAMED_COLORS.get(value.lower())
+    if named:
+        return named
+    match = _COLOR_RE.fullmatch(value)
     if not match:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Color inválido para '{param_name}'. Usa hex como #ff0000 o #f00.",
-        )
+        raise ValueError(f"Color inválido para '{param_name}'. Usa hex como #ff0000 o #f00.")
     hex_value = match.group("hex")
     if len(hex_value) == 3:
         hex_value = "".join(ch * 2 for ch in hex_value)
     return f"#{hex_value.lower()}"
 
 
+@functools.lru_cache(maxsize=256)
 def _hex_to_rgb(hex_color: str) -> tuple[int, int, int]:
-    hex_digits = hex_color.lstrip("#")
-    return tuple(int(hex_digits[i : i + 2], 16) for i in (0, 2, 4))
+    value = int(hex_color[-6:], 16)
+    return (value >> 16) & 0xFF, (value >> 8) & 0xFF, value & 0xFF
 
 
 def _make_linear_gradient(size: tuple[int, int], start: tuple[int, int, int], end: tuple[int, int, int]):
@@ -232,21 +239,68 @@ def _make_linear_gradient(size: tuple[int, int], start: tuple[int, int, int], en
     from PIL import Image
 
     width, height = size
-    gradient = Image.new("RGBA", (width, height), (*start, 255))
     if height <= 1:
-        return gradient
-    pixels = gradient.load()
-    for y in range(height):
-        t = y / (height - 1)
-        color = tuple(int(start[i] * (1 - t) + end[i] * t) for i in range(3)) + (255,)
-        for x in range(width):
-            pixels[x, y] = color
-    return gradient
+        return Image.new("RGBA", (width, height), (*start, 255))
+    # Una fila de color por altura, difundida a todo el ancho; sin bucles por pixel.
+    t = np.linspace(0.0, 1.0, height, dtype=np.float32)[:, None]
+    rgb = (np.asarray(start, dtype=np.float32) * (1.0 - t) + np.asarray(end, dtype=np.float32) * t).astype(np.uint8)
+    rows = np.broadcast_to(rgb[:, None, :], (height, width, 3))
+    alpha = np.full((height, width, 1), 255, dtype=np.uint8)
+    return Image.fromarray(np.concatenate([rows, alpha], axis=-1), "RGBA")
+
+
+def _color_for_bands(color, channels: int) -> tuple[int, ...]:
+    """Ajusta una tupla de color al número de bandas de la imagen (alpha opaco)."""
+    color = tuple(color)
+    if len(color) < channels:
+        color = color + (255,) * (channels - len(color))
+    return color[:channels]
+
+
+def _eye_pixel_mask(styled_img) -> np.ndarray:
+    """Máscara booleana a resolución de pixel con True en los ojos del QR.
+
+    Se calcula una sola vez por imagen a resolución de módulo (21-177) y se
+    escala a pixeles, en lugar de llamar a is_eye() por cada pixel.
+    """
+    modules = styled_img.width
+    box = styled_img.box_size
+    eye_grid = np.zeros((modules, modules), dtype=bool)
+    for row in range(modules):
+        for col in range(modules):
+            if styled_img.is_eye(row, col):
+                eye_grid[row, col] = True
+    eye_px = np.kron(eye_grid, np.ones((box, box), dtype=bool))
+    return np.pad(eye_px, styled_img.border * box)
+
+
+def _blend_foreground(image, back_color, paint_color, fg_colors: np.ndarray) -> None:
+    """Versión vectorizada de QRColorMask.apply_mask.
+
+    Calcula de una vez el coeficiente de interpolación de cada pixel entre el
+    fondo y el color de pintado (conservando el antialiasing) y mezcla hacia
+    el color objetivo por pixel, sin callbacks de Python por pixel.
+    """
+    arr = np.asarray(image, dtype=np.float32)
+    channels = arr.shape[-1]
+    back = np.asarray(_color_for_bands(back_color, channels), dtype=np.float32)
+    paint = np.asarray(_color_for_bands(paint_color, channels), dtype=np.float32)
+    valid = paint != back
+    if not valid.any():
+        return
+    norm = ((arr[..., valid] - back[valid]) / (paint[valid] - back[valid])).mean(axis=-1)
+    norm = np.clip(norm, 0.0, 1.0)[..., None]
+    blended = back * (1.0 - norm) + fg_colors.astype(np.float32) * norm
+    image.frombytes(np.rint(blended).astype(np.uint8).tobytes())
 
 
 class EyeColorMask(SolidFillColorMask):
     """Color mask que permite color distinto para los ojos del QR."""
 
+    # Acceso por slot para los atributos propios; las clases base de qrcode
+    # no definen __slots__, así que el __dict__ heredado sigue existiendo.
+    __slots__ = ("eye_color", "_img")
+
     def __init__(self, back_color, front_color, eye_color):
         super().__init__(back_color=back_color, front_color=front_color)
         self.eye_color = eye_color
@@ -267,18 +321,36 @@ class EyeColorMask(SolidFillColorMask):
         return self.front_color
 
     def apply_mask(self, image):
-        QRColorMask.apply_mask(self, image, use_cache=False)
+        width, height = image.size
+        channels = len(image.getbands())
+        fg = np.empty((height, width, channels), dtype=np.uint8)
+        fg[:] = _color_for_bands(self.front_color, channels)
+        fg[_eye_pixel_mask(self._img)] = _color_for_bands(self.eye_color, channels)
+        _blend_foreground(image, self.back_color, self.paint_color, fg)
 
 
 class EyeGradientMask(QRColorMask):
     """Aplica degradado al cuerpo y color fijo a los ojos."""
 
+    __slots__ = (
+        "back_color",
+        "front_from",
+        "front_to",
+        "eye_color",
+        "_img",
+        "_row_lut",
+        "height",
+        "has_transparency",
+        "paint_color",
+    )
+
     def __init__(self, back_color, front_from, front_to, eye_color):
         self.back_color = back_color
         self.front_from = front_from
         self.front_to = front_to
         self.eye_color = eye_color
         self._img = None
+        self._row_lut = None
         self.height = 1
         self.has_transparency = len(back_color) == 4
 
@@ -287,8 +359,12 @@ class EyeGradientMask(QRColorMask):
         self.height = styledPilImage.pixel_size
         super().initialize(styledPilImage, image)
 
-    def _interp(self, t: float) -> tuple[int, int, int]:
-        return tuple(int(self.front_from[i] * (1 - t) + self.front_to[i] * t) for i in range(3))
+    def _gradient_lut(self, height: int, channels: int) -> np.ndarray:
+        """LUT del degradado: un color por fila, shape (height, channels)."""
+        t = np.linspace(0.0, 1.0, max(height, 2), dtype=np.float32)[:height, None]
+        front_from = np.asarray(_color_for_bands(self.front_from, channels), dtype=np.float32)
+        front_to = np.asarray(_color_for_bands(self.front_to, channels), dtype=np.float32)
+        return (front_from * (1.0 - t) + front_to * t).astype(np.uint8)
 
     def get_fg_pixel(self, image, x, y):
         if not self._img:
@@ -297,128 +373,151 @@ class EyeGradientMask(QRColorMask):
         col = (x // self._img.box_size) - self._img.border
         if 0 <= row < self._img.width and 0 <= col < self._img.width and self._img.is_eye(row, col):
             return self.eye_color
-        t = min(max(y / max(self.height - 1, 1), 0), 1)
-        return self._interp(t)
+        if self._row_lut is None:
+            # Solo se materializa si algo recorre el camino por pixel.
+            self._row_lut = [tuple(int(v) for v in color) for color in self._gradient_lut(self.height, 3)]
+        return self._row_lut[min(y, self.height - 1)]
 
     def apply_mask(self, image):
-        QRColorMask.apply_mask(self, image, use_cache=False)
+        width, height = image.size
+        channels = len(image.getbands())
+        # LUT del degradado por fila, difundida a todo el ancho
+        lut = self._gradient_lut(height, channels)
+        fg = np.broadcast_to(lut[:, None, :], (height, width, channels)).copy()
+        fg[_eye_pixel_mask(self._img)] = _color_for_bands(self.eye_color, channels)
+        _blend_foreground(image, self.back_color, self.paint_color, fg)
 
 
 def _require_or_none(cls):
     return cls() if cls else None
 
 
-def _get_drawers(style: Style, eye_style: EyeStyle) -> Tuple[object | None, object | None]:
-    if style == Style.square:
-        module = None
-    elif style == Style.dots:
-        module = _require_or_none(CircleModuleDrawer)
-    elif style == Style.rounded:
-        module = _require_or_none(RoundedModuleDrawer)
-    elif style == Style.gapped:
-        module = _require_or_none(GappedSquareModuleDrawer)
-    elif style == Style.bars_vertical:
-        module = _require_or_none(VerticalBarsDrawer)
-    elif style == Style.bars_horizontal:
-        module = _require_or_none(HorizontalBarsDrawer)
-    else:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Estilo '{style}' no soportado")
-
-    if eye_style == EyeStyle.square:
-        eye = _require_or_none(SquareEyeDrawer)
-    elif eye_style == EyeStyle.rounded:
-        eye = _require_or_none(RoundedEyeDrawer)
-    elif eye_style == EyeStyle.dots:
-        eye = _require_or_none(CircleModuleDrawer)
-    elif eye_style == EyeStyle.gapped:
-        eye = _require_or_none(GappedSquareModuleDrawer)
-    elif eye_style == EyeStyle.bars_vertical:
-        eye = _require_or_none(VerticalBarsDrawer)
-    elif eye_style == EyeStyle.bars_horizontal:
-        eye = _require_or_none(HorizontalBarsDrawer)
-    else:  # auto
-        if style == Style.dots:
-            eye = _require_or_none(CircleModuleDrawer)
-        elif style == Style.rounded:
-            eye = _require_or_none(RoundedEyeDrawer)
-        elif style == Style.gapped:
-            eye = _require_or_none(GappedSquareModuleDrawer)
-        elif style == Style.bars_vertical:
-            eye = _require_or_none(VerticalBarsDrawer)
-        elif style == Style.bars_horizontal:
-            eye = _require_or_none(HorizontalBarsDrawer)
-        else:
-            eye = _require_or_none(SquareEyeDrawer)
-
-    return module, eye
+# Tablas de despacho a nivel de módulo: se construyen una vez en el import en
+# lugar de recorrer cadenas if/elif por petición. Se guardan clases y no
+# instancias: qrcode muta el drawer en initialize(), así que cada render
+# necesita la suya.
+_MODULE_DRAWER_BY_STYLE: dict[Style, type | None] = {
+    Style.square: None,
+    Style.dots: CircleModuleDrawer,
+    Style.rounded: RoundedModuleDrawer,
+    Style.gapped: GappedSquareModuleDrawer,
+    Style.bars_vertical: VerticalBarsDrawer,
+    Style.bars_horizontal: HorizontalBarsDrawer,
+}
+
+_EYE_DRAWER_BY_STYLE: dict[EyeStyle, type | None] = {
+    EyeStyle.square: SquareEyeDrawer,
+    EyeStyle.rounded: RoundedEyeDrawer,
+    EyeStyle.dots: CircleModuleDrawer,
+    EyeStyle.gapped: GappedSquareModuleDrawer,
+    EyeStyle.bars_vertical: VerticalBarsDrawer,
+    EyeStyle.bars_horizontal: HorizontalBarsDrawer,
+}
+
+# Ojo elegido cuando eye_style es auto, según el estilo del cuerpo.
+_AUTO_EYE_BY_STYLE: dict[Style, type | None] = {
+    Style.square: SquareEyeDrawer,
+    Style.dots: CircleModuleDrawer,
+    Style.rounded: RoundedEyeDrawer,
+    Style.gapped: GappedSquareModuleDrawer,
+    Style.bars_vertical: VerticalBarsDrawer,
+    Style.bars_horizontal: HorizontalBarsDrawer,
+}
 
 
-def _generate_qr_response(
-    *,
+def _get_drawers(style: Style, eye_style: EyeStyle) -> Tuple[object | None, object | None]:
+    if style not in _MODULE_DRAWER_BY_STYLE:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Estilo '{style}' no soportado")
+    module_cls = _MODULE_DRAWER_BY_STYLE[style]
+    if eye_style == EyeStyle.auto:
+        eye_cls = _AUTO_EYE_BY_STYLE[style]
+    else:
+        eye_cls = _EYE_DRAWER_BY_STYLE[eye_style]
+    return _require_or_none(module_cls), _require_or_none(eye_cls)
+
+
+def _png_chunk(tag: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I", len(payload)) + tag + payload + struct.pack(">I", zlib.crc32(tag + payload))
+
+
+def _encode_matrix_png(matrix, box_size: int, fill_rgb: tuple[int, int, int], back_rgb: tuple[int, int, int], compress_level: int) -> bytes:
+    """PNG de 1 bit con paleta [fondo, relleno] directamente desde la matriz.
+
+    Para el QR plano no hace falta PIL: se escala la matriz de módulos (que ya
+    incluye el borde) con np.repeat, se empaquetan los bits por fila con
+    np.packbits y se emite el stream zlib con los chunks PNG a mano.
+    """
+    cells = np.asarray(matrix, dtype=np.uint8)
+    px = np.repeat(np.repeat(cells, box_size, axis=0), box_size, axis=1)
+    height, width = px.shape
+    packed = np.packbits(px, axis=1)
+    # Byte de filtro 0 delante de cada fila
+    rows = np.hstack([np.zeros((height, 1), dtype=np.uint8), packed])
+    ihdr = struct.pack(">IIBBBBB", width, height, 1, 3, 0, 0, 0)
+    plte = bytes(back_rgb) + bytes(fill_rgb)
+    idat = zlib.compress(rows.tobytes(), compress_level)
+    return b"".join((
+        b"\x89PNG\r\n\x1a\n",
+        _png_chunk(b"IHDR", ihdr),
+        _png_chunk(b"PLTE", plte),
+        _png_chunk(b"IDAT", idat),
+        _png_chunk(b"IEND", b""),
+    ))
+
+
+@functools.lru_cache(maxsize=512)
+def _render_cached(
     data: str,
     output_format: OutputFormat,
     error_correction: ErrorCorrection,
     box_size: int,
     border: int,
-    fill_color: str,
-    back_color: str,
-    eye_color: str | None,
+    fill: str,
+    back: str,
+    eye: str | None,
     eye_style: EyeStyle,
     style: Style,
     fill_mode: FillMode,
-    fill_color_to: str | None,
-) -> Response:
-    # Forzar restricciones de SVG: sin estilos ni colores custom de ojos/degradado.
-    if output_format == OutputFormat.svg:
-        style = Style.square
-        eye_style = EyeStyle.auto
-        eye_color = None
-        fill_mode = FillMode.solid
-        fill_color_to = None
-
-    error_map = {
-        ErrorCorrection.L: ERROR_CORRECT_L,
-        ErrorCorrection.M: ERROR_CORRECT_M,
-        ErrorCorrection.Q: ERROR_CORRECT_Q,
-        ErrorCorrection.H: ERROR_CORRECT_H,
-    }
-
-    fill = _validate_color(fill_color, "fill_color") if fill_color else "#000000"
-    back = _validate_color(back_color, "back_color") if back_color else "#ffffff"
-    fill_to = _validate_color(fill_color_to, "fill_color_to") if fill_color_to else fill
-    eye = _validate_color(eye_color, "eye_color") if eye_color else fill
+    fill_to: str,
+    compress_level: int,
+) -> tuple[bytes, str]:
+    """Renderiza el QR y devuelve (bytes, media_type).
+
+    Los parámetros llegan ya normalizados (colores validados, restricciones de
+    SVG aplicadas), de modo que peticiones equivalentes comparten entrada de
+    cache y el render completo solo se paga en el primer miss.
+    """
     fill_rgb = _hex_to_rgb(fill)
     fill_to_rgb = _hex_to_rgb(fill_to)
     back_rgb = _hex_to_rgb(back)
-    eye_rgb = _hex_to_rgb(eye)
+    eye_rgb = _hex_to_rgb(eye) if eye else fill_rgb
+
+    # segno codifica y escribe PNG/SVG bastante más rápido que qrcode+PIL y
+    # genera SVGs de un solo path; cubre todo lo que no necesita drawers PIL.
+    if output_format == OutputFormat.svg:
+        out = io.BytesIO()
+        segno.make(data, error=error_correction.value.lower(), micro=False).save(
+            out, kind="svg", scale=box_size, border=border, dark=fill, light=back, xmldecl=True
+        )
+        return out.getvalue(), "image/svg+xml"
 
     qr = qrcode.QRCode(
         version=None,
-        error_correction=error_map[error_correction],
+        error_correction=_EC_MAP[error_correction],
         box_size=box_size,
         border=border,
     )
     qr.add_data(data)
     qr.make(fit=True)
 
-    if output_format == OutputFormat.svg:
-        if style != Style.square or eye_style != EyeStyle.auto or eye_color or fill_mode != FillMode.solid:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Los estilos personalizados (estilo/ojos/degradado) solo aplican a PNG",
-            )
-        img = qr.make_image(image_factory=SvgImage, fill_color=fill, back_color=back)
-        out = io.BytesIO()
-        img.save(out)
-        return Response(
-            content=out.getvalue(),
-            media_type="image/svg+xml",
-            headers={"Content-Disposition": 'inline; filename=\"qr.svg\"'},
-        )
+    if style == Style.square and not eye and eye_style == EyeStyle.auto:
+        # Camino plano: PNG de paleta escrito a mano, sin PIL ni BytesIO.
+        return _encode_matrix_png(qr.get_matrix(), box_size, fill_rgb, back_rgb, compress_level), "image/png"
 
     module_drawer, eye_drawer = _get_drawers(style, eye_style)
 
-    if not module_drawer and (eye_color or eye_style != EyeStyle.auto):
+    if not module_drawer:
+        # Estilo cuadrado con ojos custom: drawers cuadrados explícitos.
         module_drawer = _require_or_none(SquareModuleDrawer)
         eye_drawer = eye_drawer or _require_or_none(SquareEyeDrawer)
 
@@ -433,25 +532,107 @@ def _generate_qr_response(
             else SolidFillColorMask(front_color=fill_rgb, back_color=back_rgb)
         )
 
-    if module_drawer:
-        img = qr.make_image(
-            image_factory=StyledPilImage,
-            module_drawer=module_drawer,
-            eye_drawer=eye_drawer,
-            color_mask=color_mask,
-        )
-    else:
-        img = qr.make_image(image_factory=PilImage, fill_color=fill_rgb, back_color=back_rgb)
+    img = qr.make_image(
+        image_factory=StyledPilImage,
+        module_drawer=module_drawer,
+        eye_drawer=eye_drawer,
+        color_mask=color_mask,
+    )
 
     out = io.BytesIO()
-    img.save(out, format="PNG")
+    img.save(out, format="PNG", compress_level=compress_level, optimize=False)
+    # Única copia del buffer: Response referencia estos bytes cacheados tal
+    # cual (con Content-Length explícito), sin recopiar ni trocear en chunks.
+    return out.getvalue(), "image/png"
+
+
+def _generate_qr_response(
+    *,
+    data: str,
+    output_format: OutputFormat,
+    error_correction: ErrorCorrection,
+    box_size: int,
+    border: int,
+    fill_color: str,
+    back_color: str,
+    eye_color: str | None,
+    eye_style: EyeStyle,
+    style: Style,
+    fill_mode: FillMode,
+    fill_color_to: str | None,
+    compress_level: int = 1,
+    if_none_match: str | None = None,
+) -> Response:
+    # Forzar restricciones de SVG: sin estilos ni colores custom de ojos/degradado.
+    if output_format == OutputFormat.svg:
+        style = Style.square
+        eye_style = EyeStyle.auto
+        eye_color = None
+        fill_mode = FillMode.solid
+        fill_color_to = None
+
+    # Los colores ya llegan normalizados (#rrggbb) por el validator del modelo.
+    fill = fill_color or "#000000"
+    back = back_color or "#ffffff"
+    fill_to = fill_color_to or fill
+    eye = eye_color or None
+
+    key = (
+        data,
+        output_format,
+        error_correction,
+        box_size,
+        border,
+        fill,
+        back,
+        eye,
+        eye_style,
+        style,
+        fill_mode,
+        fill_to,
+        compress_level,
+    )
+    # El QR es función pura de sus parámetros: ETag fuerte sobre la clave
+    # normalizada para que navegadores/CDN reutilicen la respuesta.
+    etag = '"' + hashlib.blake2b(repr(key).encode(), digest_size=16).hexdigest() + '"'
+    cache_headers = {"ETag": etag, "Cache-Control": "public, max-age=86400, immutable"}
+    if if_none_match and etag in {tag.strip() for tag in if_none_match.split(",")}:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers)
+
+    content, media_type = _render_cached(*key)
+    filename = "qr.svg" if output_format == OutputFormat.svg else "qr.png"
     return Response(
-        content=out.getvalue(),
-        media_type="image/png",
-        headers={"Content-Disposition": 'inline; filename=\"qr.png\"'},
+        content=content,
+        media_type=media_type,
+        headers={"Content-Disposition": f'inline; filename="{filename}"', **cache_headers},
     )
 
 
+_VALIDATED_BODIES: OrderedDict[bytes, QRRequest] = OrderedDict()
+_VALIDATED_BODIES_MAX = 256
+
+
+def _validate_body(raw: bytes) -> QRRequest:
+    """Valida el body JSON cacheando por hash del contenido crudo.
+
+    Los presets del frontend repiten bodies byte a byte, así que un hit evita
+    pasar otra vez por la validación Pydantic completa.
+    """
+    key = hashlib.blake2b(raw, digest_size=16).digest()
+    cached = _VALIDATED_BODIES.get(key)
+    if cached is not None:
+        _VALIDATED_BODIES.move_to_end(key)
+        return cached
+    try:
+        payload = QRRequest.model_validate_json(raw)
+    except ValidationError as exc:
+        raise RequestValidationError(exc.errors()) from exc
+    _VALIDATED_BODIES[key] = payload
+    if len(_VALIDATED_BODIES) > _VALIDATED_BODIES_MAX:
+        _VALIDATED_BODIES.popitem(last=False)
+    return payload
+
+
 @router.post(
     "/qr",
     summary="Generar QR (JSON body)",
@@ -519,8 +700,11 @@ def _generate_qr_response(
         }
     },
 )
-def generate_qr_body(payload: QRRequest = Body(...)) -> Response:
-    return _generate_qr_response(
+async def generate_qr_body(request: Request) -> Response:
+    payload = _validate_body(await request.body())
+    # El render es CPU-bound: se delega a un hilo para no bloquear el event loop.
+    return await asyncio.to_thread(
+        _generate_qr_response,
         data=payload.data,
         output_format=payload.output_format,
         error_correction=payload.error_correction,
@@ -533,4 +717,6 @@ def generate_qr_body(payload: QRRequest = Body(...)) -> Response:
         style=payload.style,
         fill_mode=payload.fill_mode,
         fill_color_to=payload.fill_color_to,
+        compress_level=payload.compress_level,
+        if_none_match=request.headers.get("if-none-match"),
     )